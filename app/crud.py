@@ -1,79 +1,51 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from fastapi import HTTPException
-from passlib.context import CryptContext
-from jose import jwt, JWTError
-from datetime import datetime, timedelta
+from datetime import datetime
 from . import models, schemas
-from dotenv import load_dotenv
-import os
-from .utils import verify_password, hash_password
+from .utils import verify_password, hash_password, verify_dummy_password
 
 
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-load_dotenv()
-ALGORITHM = os.getenv("ALGORITHM")
-SECRET_KEY = os.getenv("SECRET_KEY")
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
-
-def decode_access_token(token: str) -> dict:
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
 # CRUD Functions
 def create_user(db: Session, user: schemas.UserCreate):
+    # Insert and dedupe on email in one round-trip; returns None if the email is taken
     hashed_password = hash_password(user.password)
-    db_user = models.User(
-        first_name=user.first_name,
-        last_name=user.last_name,
-        email=user.email,
-        password_hash=hashed_password,
-        location=user.location,
-        home_gym=user.home_gym,
-        grade_style=user.grade_style, 
+    stmt = (
+        pg_insert(models.User)
+        .values(
+            first_name=user.first_name,
+            last_name=user.last_name,
+            email=user.email,
+            password_hash=hashed_password,
+            location=user.location,
+            home_gym=user.home_gym,
+            grade_style=user.grade_style,
+        )
+        .on_conflict_do_nothing(index_elements=["email"])
+        .returning(models.User)
     )
-    db.add(db_user)
+    db_user = db.scalars(stmt).first()
+    if db_user is None:
+        db.rollback()
+        return None
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def user_login(userLogin: schemas.UserLogin, db: Session):
-    # Retrieve user by email
-    user = get_user_by_email(db, userLogin.email)
-    if not user:
-        raise HTTPException(status_code=400, detail="Invalid email or password")
-
-    # Verify password
-    if not verify_password(userLogin.password, user.password_hash):
-        raise HTTPException(status_code=400, detail="Invalid email or password")
-
-    # Generate tokens
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": {"id": user.id, "email": user.email},
-    }
-
 def authenticate_user(db: Session, email: str, password: str):
     user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.password_hash):
+    if not user:
+        verify_dummy_password(password)
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    if not verify_password(password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     return user
 
 def update_user(db: Session, user_id: int, updates: dict):
     # Fetch user by ID
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = db.get(models.User, user_id)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
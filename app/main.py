@@ -1,75 +1,100 @@
 from fastapi import FastAPI, HTTPException, Depends, Body, Security, Request
 from sqlalchemy.orm import Session
-from passlib.hash import bcrypt
 from . import models, schemas, crud, dev_routes
 from .database import engine, Base, get_db
 from dotenv import load_dotenv
 import os
-from datetime import timedelta, datetime 
-from jose import jwt
+import asyncio
+import time
+import warnings
+import base64
+import hashlib
+import hmac
+import orjson
+import jwt
 from .schemas import UserResponse
-from jose.exceptions import JWTError
-from fastapi.security import OAuth2PasswordBearer
+from jwt import InvalidTokenError
+from fastapi.responses import ORJSONResponse
 from .utils import verify_password, hash_password
 from typing import List, Optional
 from sqlalchemy import func, case, cast, Integer
-from .auth import get_current_user
+from .auth import get_current_user, oauth2_scheme, ALGORITHM, SECRET_KEY
 
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 Base.metadata.create_all(bind=engine)
 
-ALGORITHM = os.getenv("ALGORITHM")
-SECRET_KEY = os.getenv("SECRET_KEY")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
 REFRESH_TOKEN_EXPIRE_MINUTES = int(os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES", 10080))
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+ACCESS_TOKEN_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+REFRESH_TOKEN_EXPIRE_SECONDS = REFRESH_TOKEN_EXPIRE_MINUTES * 60
+
+if not SECRET_KEY:
+    raise RuntimeError("SECRET_KEY must be set")
+_SECRET_KEY_BYTES = SECRET_KEY.encode()
+_ALGORITHMS = (ALGORITHM,)
+
+# Tokens are HMAC-signed by hand: the header segment never changes, so encode it once
+_HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+if ALGORITHM not in _HMAC_DIGESTS:
+    raise RuntimeError(f"ALGORITHM must be HS256, HS384 or HS512 (got {ALGORITHM!r})")
+_HMAC_DIGEST = _HMAC_DIGESTS[ALGORITHM]
+# Keyed once; each token signs on a copy so the ipad/opad setup isn't redone per call
+_HMAC_TEMPLATE = hmac.new(_SECRET_KEY_BYTES, digestmod=_HMAC_DIGEST)
+
+# HMAC signing should run on OpenSSL's SHA-2 (which uses SHA-NI/ARMv8 SHA where available)
+if type(hashlib.sha256()).__module__ != "_hashlib":
+    warnings.warn("hashlib is not backed by OpenSSL; JWT signing will use the slower builtin SHA-2")
 
 
 if os.getenv("ENV") != "production":
     app.include_router(dev_routes.router)
 
-def create_access_token(data: dict, expires_delta: timedelta = None):
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+_HEADER_B64 = _b64encode(orjson.dumps({"alg": ALGORITHM, "typ": "JWT"}))
+
+def _encode_token(payload: dict) -> str:
+    signing_input = _HEADER_B64 + b"." + _b64encode(orjson.dumps(payload))
+    mac = _HMAC_TEMPLATE.copy()
+    mac.update(signing_input)
+    signature = mac.digest()
+    return (signing_input + b"." + _b64encode(signature)).decode()
+
+def create_access_token(data: dict, expires_seconds: int = ACCESS_TOKEN_EXPIRE_SECONDS):
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-def create_refresh_token(data: dict, expires_delta: timedelta = None):
+    to_encode.update({"exp": int(time.time()) + expires_seconds})
+    return _encode_token(to_encode)
+
+def create_refresh_token(data: dict, expires_seconds: int = REFRESH_TOKEN_EXPIRE_SECONDS):
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(days=7)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode.update({"exp": int(time.time()) + expires_seconds})
+    return _encode_token(to_encode)
 
 def verify_access_token(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("id")  
-        if username is None or user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication token")
-        return {"email": username, "id": user_id}
-    except JWTError:
+        payload = jwt.decode(
+            token,
+            _SECRET_KEY_BYTES,
+            algorithms=_ALGORITHMS,
+            options={"require": ["sub", "id", "exp"]},
+        )
+        return {"email": payload["sub"], "id": payload["id"]}
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid authentication token")
 
 def verify_refresh_token(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("id")  
-        if username is None or user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid refresh token")
-        return {"email": username, "id": user_id}
-    except JWTError:
+        payload = jwt.decode(
+            token,
+            _SECRET_KEY_BYTES,
+            algorithms=_ALGORITHMS,
+            options={"require": ["sub", "id", "exp"]},
+        )
+        return {"email": payload["sub"], "id": payload["id"]}
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
 
@@ -78,33 +103,31 @@ def verify_refresh_token(token: str):
 
 @app.post("/users/", response_model=schemas.UserResponse)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if existing_user:
+    db_user = crud.create_user(db=db, user=user)
+    if db_user is None:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    return db_user
 
-@app.post("/login/")
-def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = crud.authenticate_user(db, user.email, user.password)
+@app.post("/login/", response_model=schemas.TokenResponse)
+async def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
+    db_user = await asyncio.to_thread(crud.authenticate_user, db, user.email, user.password)
     if not db_user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    access_token_expires = timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES))
     access_token = create_access_token(
         data={"sub": db_user.email, "id": db_user.id},
-        expires_delta=access_token_expires
+        expires_seconds=ACCESS_TOKEN_EXPIRE_SECONDS
     )
     
-    refresh_token_expires = timedelta(minutes=int(REFRESH_TOKEN_EXPIRE_MINUTES))
     refresh_token = create_refresh_token(
         data={"sub": db_user.email, "id": db_user.id},
-        expires_delta=refresh_token_expires
+        expires_seconds=REFRESH_TOKEN_EXPIRE_SECONDS
     )
     
-    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+    return schemas.TokenResponse(access_token=access_token, refresh_token=refresh_token)
 
 
-@app.post("/refresh-token/")
+@app.post("/refresh-token/", response_model=schemas.TokenResponse)
 def refresh_token(refresh_token: str = Body(...), db: Session = Depends(get_db)):
     if not refresh_token:
         raise HTTPException(status_code=400, detail="Refresh token is required.")
@@ -114,22 +137,21 @@ def refresh_token(refresh_token: str = Body(...), db: Session = Depends(get_db))
         token_data = verify_refresh_token(refresh_token)
 
         # Issue new access token
-        expires_delta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         new_access_token = create_access_token(
             data={"sub": token_data["email"], "id": token_data["id"]},
-            expires_delta=expires_delta,
+            expires_seconds=ACCESS_TOKEN_EXPIRE_SECONDS,
         )
 
         # Rotate the refresh token
         new_refresh_token = create_refresh_token(
             data={"sub": token_data["email"], "id": token_data["id"]},
-            expires_delta=timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES),
+            expires_seconds=REFRESH_TOKEN_EXPIRE_SECONDS,
         )
 
-        return {
-            "access_token": new_access_token,
-            "refresh_token": new_refresh_token,
-        }
+        return schemas.TokenResponse(
+            access_token=new_access_token,
+            refresh_token=new_refresh_token,
+        )
 
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh token.")
@@ -140,8 +162,8 @@ def protected_route(token: str = Depends(verify_access_token)):
     return {"message": f"Hello, {token}"}
 
 @app.get("/get_user/", response_model=UserResponse)
-def get_user(id: str, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == id).first()
+def get_user(id: int, db: Session = Depends(get_db)):
+    user = db.get(models.User, id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -156,31 +178,30 @@ def update_user(
     return updated_user
 
 @app.post("/change_password/", response_model=dict)
-def change_password(
+async def change_password(
     data: schemas.ChangePasswordSchema,
     token: dict = Security(verify_access_token),
     db: Session = Depends(get_db)
 ):
 
+    # Reject an unchanged password before paying for any bcrypt work
+    if data.current_password == data.new_password:
+        raise HTTPException(status_code=400, detail="New password cannot be the same as the current password")
+
     #Get the user from the db
     user_id = token.get("id")
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await asyncio.to_thread(db.get, models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Verify the current password
-    if not verify_password(data.current_password, user.password_hash):
+    if not await asyncio.to_thread(verify_password, data.current_password, user.password_hash):
         raise HTTPException(status_code=400, detail="Invalid current password")
 
-    # Check if the new password is the same as the current password
-    if verify_password(data.new_password, user.password_hash):
-        raise HTTPException(status_code=400, detail="New password cannot be the same as the current password")
-
     # Hash the new password and update the user's password
-    hashed_new_password = hash_password(data.new_password)
+    hashed_new_password = await asyncio.to_thread(hash_password, data.new_password)
     user.password_hash = hashed_new_password
-    db.commit()
-    db.refresh(user)
+    await asyncio.to_thread(db.commit)
 
 
     return {"message": "Password updated successfully"}
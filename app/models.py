@@ -11,7 +11,7 @@ class User(Base):
     first_name = Column(String(50), nullable=False)
     last_name = Column(String(50), nullable=False)
     username = Column(String(50), unique=True, nullable=True)
-    email = Column(String(100), unique=True, nullable=False)
+    email = Column(String(100), unique=True, index=True, nullable=False)
     password_hash = Column(Text, nullable=False)
     profile_image_url = Column(String(200), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -71,6 +71,11 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class TokenResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str = "bearer"
+
 class TokenData(BaseModel):
     email: EmailStr | None = None
 
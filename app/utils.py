@@ -1,9 +1,22 @@
-from passlib.context import CryptContext
+import bcrypt
+import os
+import secrets
+from dotenv import load_dotenv
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+load_dotenv()
+
+# bcrypt work factor (2^cost rounds); tune per deployment to keep hashing around ~250ms
+BCRYPT_COST = int(os.getenv("BCRYPT_COST", 12))
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_COST)).decode()
+
+# Verified against when a login email is unknown so the miss costs the same bcrypt work as a hit
+_DUMMY_PASSWORD_HASH = hash_password(secrets.token_urlsafe(16)).encode()
+
+def verify_dummy_password(plain_password: str) -> None:
+    # Result is discarded: this only spends the same bcrypt time a real account check would
+    bcrypt.checkpw(plain_password.encode(), _DUMMY_PASSWORD_HASH)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
\ No newline at end of file